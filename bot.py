@@ -1,15 +1,16 @@
 import os
+import asyncio
+import datetime
+import concurrent.futures
 import discord
 import logging
 from dotenv import load_dotenv
 from discord.ext import commands
-from expense_parser import parse_expense
+from expense_parser import looks_like_expense, parse_expense
 from sheets_manager import ExpenseSheetManager
 from config import CONFIG
 
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
 load_dotenv()
@@ -23,6 +24,23 @@ intents.dm_messages = True
 bot = commands.Bot(command_prefix='!', intents=intents)
 sheets_manager = None
 
+# gspread is blocking; run sheet calls here so they don't stall the event loop
+_executor = concurrent.futures.ThreadPoolExecutor(max_workers=4)
+
+async def _run_blocking(func, *args):
+    """Run a blocking call in the sheet executor and await its result."""
+    return await asyncio.get_running_loop().run_in_executor(_executor, func, *args)
+
+def _format_amounts(amounts):
+    """Format {currency: amount} as e.g. '$12.00 + ₹100.00' without mixing currencies."""
+    merged = {}
+    for currency, amount in amounts.items():
+        currency = currency or CONFIG['DEFAULT_CURRENCY']
+        merged[currency] = merged.get(currency, 0.0) + amount
+    if not merged:
+        return f"{CONFIG['DEFAULT_CURRENCY']}0.00"
+    return " + ".join(f"{currency}{amount:.2f}" for currency, amount in merged.items())
+
 @bot.event
 async def on_ready():
     """Event triggered when the bot is logged in and ready."""
@@ -36,7 +54,7 @@ async def on_ready():
         user_id= os.environ.get("DISCORD_USER_ID")
         user = await bot.fetch_user(user_id)
         await user.send("Welcome, track you expenses")
-        sheets_manager = ExpenseSheetManager()
+        sheets_manager = await _run_blocking(ExpenseSheetManager)
         logger.info("Google Sheets manager initialized successfully")
     except Exception as e:
         logger.error(f"Failed to initialize Google Sheets manager: {str(e)}")
@@ -51,11 +69,13 @@ async def on_message(message):
     
     if not message.content.startswith(bot.command_prefix):
         try:
-            expense = parse_expense(message.content)
+            now = datetime.datetime.now()
+            # Skip the parser for chat that can't be an expense
+            expense = parse_expense(message.content, now) if looks_like_expense(message.content) else None
             if expense:
                 if sheets_manager:
-                    result = sheets_manager.add_expense(expense)
-                    await message.channel.send(f"✅ Expense Added: {expense['amount']} for {expense['category']} - {expense['description']}")
+                    result = await _run_blocking(sheets_manager.add_expense, expense, now)
+                    await message.channel.send(f"✅ Expense Added: {expense['currency']}{expense['amount']} for {expense['category']} - {expense['description']}")
                 else:
                     await message.channel.send("❌ Google Sheets connection not established. Try again later.")
             else:
@@ -91,11 +111,11 @@ async def recent_command(ctx, count: int = 5):
     """Show recent expenses."""
     if sheets_manager:
         try:
-            expenses = sheets_manager.get_recent_expenses(count)
+            expenses = await _run_blocking(sheets_manager.get_recent_expenses, count)
             if expenses:
                 message = "**Recent Expenses:**\n"
                 for expense in expenses:
-                    message += f"• {expense['date']}: ${expense['amount']} for {expense['category']} - {expense['description']}\n"
+                    message += f"• {expense['date']}: {expense['currency'] or CONFIG['DEFAULT_CURRENCY']}{expense['amount']} for {expense['category']} - {expense['description']}\n"
                 await ctx.send(message)
             else:
                 await ctx.send("No recent expenses found.")
@@ -110,14 +130,14 @@ async def total_command(ctx, category: str = None):
     """Show total expenses, optionally filtered by category."""
     if sheets_manager:
         try:
-            total, breakdown = sheets_manager.get_total_expenses(category)
+            total, breakdown = await _run_blocking(sheets_manager.get_total_expenses, category)
             
             if category:
-                message = f"**Total Expenses for {category.capitalize()}:** ${total:.2f}"
+                message = f"**Total Expenses for {category.capitalize()}:** {_format_amounts(total)}"
             else:
-                message = f"**Total Expenses:** ${total:.2f}\n\n**Breakdown by Category:**\n"
-                for cat, amount in breakdown.items():
-                    message += f"• {cat}: ${amount:.2f}\n"
+                message = f"**Total Expenses:** {_format_amounts(total)}\n\n**Breakdown by Category:**\n"
+                for cat, amounts in breakdown.items():
+                    message += f"• {cat}: {_format_amounts(amounts)}\n"
                     
             await ctx.send(message)
         except Exception as e:
@@ -131,7 +151,7 @@ async def categories_command(ctx):
     """List all expense categories."""
     if sheets_manager:
         try:
-            categories = sheets_manager.get_categories()
+            categories = await _run_blocking(sheets_manager.get_categories)
             if categories:
                 await ctx.send("**Available Categories:**\n• " + "\n• ".join(categories))
             else:
@@ -142,6 +162,11 @@ async def categories_command(ctx):
     else:
         await ctx.send("❌ Google Sheets connection not established. Try again later.")
 
+def configure_logging():
+    """Configure the root logger from LOGLEVEL; unknown values fall back to INFO."""
+    level = getattr(logging, os.environ.get('LOGLEVEL', 'INFO').strip().upper(), None)
+    logging.basicConfig(level=level if isinstance(level, int) else logging.INFO)
+
 def start_bot():
     """Start the Discord bot with the token from environment variables."""
     token = os.environ.get('DISCORD_BOT_TOKEN')
@@ -154,6 +179,14 @@ def start_bot():
     except Exception as e:
         logger.error(f"Error starting bot: {str(e)}")
         raise
+    finally:
+        # Write any expenses still queued for the sheet before exiting
+        if sheets_manager:
+            try:
+                sheets_manager.flush()
+            except Exception:
+                logger.error("Queued expenses could not be written to Google Sheets before exit")
 
 if __name__ == "__main__":
-    start_bot()
+    configure_logging()
+    start_bot()
\ No newline at end of file
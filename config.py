@@ -1,8 +1,8 @@
 # Configuration settings for the expense tracker bot
 
 CONFIG = {
-    # Sheet columns
-    'SHEET_COLUMNS': ['Date', 'Amount', 'Category', 'Description', 'Timestamp'],
+    # Sheet columns (Currency is last so sheets created before it still line up)
+    'SHEET_COLUMNS': ['Date', 'Amount', 'Category', 'Description', 'Timestamp', 'Currency'],
     
     # Default expense categories
     'DEFAULT_CATEGORIES': [
@@ -20,8 +20,24 @@ CONFIG = {
         'other'
     ],
     
+    # Sheet write batching: queued expenses are appended together once no
+    # new expense arrives for SHEET_FLUSH_DELAY seconds, or once
+    # SHEET_FLUSH_BATCH_SIZE rows are waiting. Failed writes are retried with
+    # the delay doubling up to SHEET_FLUSH_MAX_DELAY; at most
+    # SHEET_MAX_PENDING rows are queued before add_expense reports the error
+    'SHEET_FLUSH_DELAY': 1.0,
+    'SHEET_FLUSH_BATCH_SIZE': 10,
+    'SHEET_FLUSH_MAX_DELAY': 60.0,
+    'SHEET_MAX_PENDING': 100,
+    
+    # Seconds before cached sheet contents are refetched, so edits made
+    # directly in the Google Sheet show up
+    'SHEET_CACHE_TTL': 60,
+    
     # Bot settings
     'COMMAND_PREFIX': '!',
+    # Shown for expenses entered without a currency
+    'DEFAULT_CURRENCY': '$',
     'DEFAULT_RECENT_COUNT': 5,
     
     # App settings
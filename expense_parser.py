@@ -94,11 +94,64 @@ import re
 import datetime
 import logging
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
-def parse_expense(message):
+# Match: <currency symbol or code><amount> <category> [optional description]
+_PAT = re.compile(r'^([₹$€]|INR|USD|EUR)?\s*(\d+(?:\.\d+)?)\s+([^\s]+)(?:\s+(.+))?$', re.IGNORECASE)
+
+# Currency prefixes handled without the regex
+_CURRENCY_CHARS = '$₹€'
+_CURRENCY_CODES = ('INR', 'USD', 'EUR')
+# Non-digit characters an expense message can start with
+_PREFIX_CHARS = _CURRENCY_CHARS + ''.join(code[0] for code in _CURRENCY_CODES)
+
+def _split_simple(message):
+    """
+    Split the common "<currency><amount> <category> [description]" form with
+    plain string operations.
+
+    Returns:
+        tuple of (currency, amount, category, description), or None when the
+        message needs the full regex
+    """
+    # split() treats line breaks as spaces but _PAT's "." does not match
+    # them; let the regex decide multi-line messages
+    if '\n' in message or '\r' in message:
+        return None
+    parts = message.split(maxsplit=2)
+    if len(parts) < 2:
+        return None
+
+    first = parts[0]
+    if first[:3].upper() in _CURRENCY_CODES:
+        currency = first[:3]
+    elif first[0] in _CURRENCY_CHARS:
+        currency = first[0]
+    else:
+        currency = None
+    amount = first[len(currency):] if currency else first
+
+    # Same shape as the regex: digits with an optional fractional part
+    whole, dot, frac = amount.partition('.')
+    if not (whole.isascii() and whole.isdigit()):
+        return None
+    if dot and not (frac.isascii() and frac.isdigit()):
+        return None
+
+    description = parts[2] if len(parts) > 2 else None
+    return currency, amount, parts[1], description
+
+def looks_like_expense(message):
+    """
+    Cheap first-character check: True if the message could be an expense,
+    i.e. it starts with a digit, a currency symbol or a currency code.
+    """
+    first = message.lstrip()[:1]
+    if not first:
+        return False
+    return first.isdigit() or first.upper() in _PREFIX_CHARS
+
+def parse_expense(message, now=None):
     """
     Parse an expense message in the format:
     <currency><amount> <category> <optional description>
@@ -111,22 +164,29 @@ def parse_expense(message):
     - "€12.50 coffee Starbucks"
     - "INR150 travel cab fare"
 
+    Args:
+        message (str): The expense message to parse
+        now (datetime.datetime, optional): Time used for the expense date;
+            defaults to the current time
+
     Returns:
         dict or None
     """
     message = message.strip()
 
-    # Match: <currency symbol or code><amount> <category> [optional description]
-    pattern = r'^([₹$€]|INR|USD|EUR)?\s*(\d+(?:\.\d+)?)\s+([^\s]+)(?:\s+(.+))?$'
-
     try:
-        match = re.match(pattern, message, re.IGNORECASE)
-        if match:
-            currency, amount, category, description = match.groups()
+        groups = _split_simple(message)
+        if groups is None:
+            match = _PAT.match(message)
+            groups = match.groups() if match else None
+        if groups:
+            currency, amount, category, description = groups
+            if now is None:
+                now = datetime.datetime.now()
             return {
-                'date': datetime.datetime.now().strftime('%Y-%m-%d'),
-                # 'currency': (currency or '').upper(),
-                'amount': f"{(currency or '').upper()}{float(amount)}",
+                'date': now.strftime('%Y-%m-%d'),
+                'amount': float(amount),
+                'currency': (currency or '').upper(),
                 'category': category.lower(),
                 'description': description if description else ''
             }
@@ -1,10 +1,10 @@
 import logging
-from bot import start_bot
+from bot import configure_logging, start_bot
 from dotenv import load_dotenv
 load_dotenv()
 
 # Configure logging
-logging.basicConfig(level=logging.DEBUG)
+configure_logging()
 logger = logging.getLogger(__name__)
 
 if __name__ == '__main__':
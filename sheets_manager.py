@@ -1,17 +1,62 @@
 import os
+import re
+import json
 import gspread
+from gspread.utils import rowcol_to_a1
 from dotenv import load_dotenv
 from oauth2client.service_account import ServiceAccountCredentials
 import datetime
 import logging
+import threading
+import time
+import collections
 from config import CONFIG
 load_dotenv()
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
+# Amount cells written by older versions, e.g. "USD10.0" or "$10.0"
+_PREFIXED_AMOUNT = re.compile(r'^([₹$€]|INR|USD|EUR)\s*(\d+(?:\.\d+)?)$', re.IGNORECASE | re.ASCII)
+
+def _split_amount(value):
+    """
+    Convert an Amount cell to (amount, currency prefix). Currency-prefixed
+    strings are split; other unreadable cells count as 0.
+    """
+    try:
+        return float(value or 0), ''
+    except (TypeError, ValueError):
+        pass
+    match = _PREFIXED_AMOUNT.match(str(value).strip())
+    if match:
+        return float(match.group(2)), match.group(1).upper()
+    logger.warning(f"Treating unreadable Amount cell as 0: {value!r}")
+    return 0.0, ''
+
+def _column_positions(header):
+    """
+    Map each of CONFIG['SHEET_COLUMNS'] to its index in the sheet. Columns
+    missing from an older header fall back to their configured position.
+    """
+    return {
+        name: header.index(name) if name in header else position
+        for position, name in enumerate(CONFIG['SHEET_COLUMNS'])
+    }
+
+def _row_to_record(positions, row):
+    """Turn a list of cell values into a record keyed by column name."""
+    return {name: row[i] if i < len(row) else '' for name, i in positions.items()}
+
 class ExpenseSheetManager:
+    """
+    Reads and writes expenses in the 'Expenses' worksheet.
+
+    add_expense always appends at the end of the sheet, so the rows it
+    writes (and the cached columns) are in chronological order and the
+    newest expenses are the last rows. Rows people add by hand are read
+    too, but only rows appended at the end keep that order: a row inserted
+    in the middle is treated as older than everything below it.
+    """
     def __init__(self):
         """Initialize the Google Sheets connection."""
         scope = ['https://spreadsheets.google.com/feeds',
@@ -29,7 +74,7 @@ class ExpenseSheetManager:
         
         try:
             creds = ServiceAccountCredentials.from_json_keyfile_dict(
-               eval(creds_json), scope)
+               json.loads(creds_json), scope)
             self.client = gspread.authorize(creds)
             self.spreadsheet = self.client.open_by_key(self.sheet_id)
             try:
@@ -37,53 +82,257 @@ class ExpenseSheetManager:
             except gspread.exceptions.WorksheetNotFound:
                 self.worksheet = self.spreadsheet.add_worksheet(
                     title='Expenses', rows=1000, cols=20)
-                self.worksheet.append_row([
-                    'Date', 'Amount', 'Category', 'Description', 'Timestamp'
-                ])
+                self.worksheet.append_row(CONFIG['SHEET_COLUMNS'])
+            # Label columns added since the sheet was created (e.g. Currency)
+            header = self.worksheet.row_values(1)
+            for position, name in enumerate(CONFIG['SHEET_COLUMNS']):
+                if name not in header and (position >= len(header) or not header[position]):
+                    self.worksheet.update_cell(1, position + 1, name)
+                    logger.info(f"Added missing '{name}' header to the Expenses sheet")
+                    header += [''] * (position + 1 - len(header))
+                    header[position] = name
+            # Where each column lives in the sheet; refreshed with the caches
+            self._positions = _column_positions(header)
+            # Rows in use, header and queued rows included; kept in step with add_expense
+            self._row_count = len(self.worksheet.col_values(1))
+            # Rows waiting to be written in one append_rows call
+            self._pending = collections.deque()
+            self._flush_timer = None
+            # Consecutive failed writes; backs off the retry delay
+            self._flush_failures = 0
+            # Sheet contents, filled by a read and then kept up to date by
+            # add_expense instead of being refetched. Refetched once older
+            # than CONFIG['SHEET_CACHE_TTL'] to pick up edits made in the sheet.
+            # Stored column-wise: one list of cell values per sheet column,
+            # with the Amount column parsed to floats (also self._amounts).
+            # self._lock guards this in-memory state and is never held across
+            # a network call. self._write_lock keeps sheet writes in order;
+            # uncached reads take it too so they line up with the queue.
+            self._lock = threading.Lock()
+            self._write_lock = threading.Lock()
+            self._columns = None
+            self._amounts = None
+            self._cache_loaded_at = 0.0
+            self._breakdown_cache = None
+            self._categories_cache = None
             logger.info("Successfully connected to Google Sheets")
         except Exception as e:
             logger.error(f"Error connecting to Google Sheets: {str(e)}")
             raise
     
-    def add_expense(self, expense):
+    def add_expense(self, expense, now=None):
         """
         Add an expense to the Google Sheet.
         dict:
                 - date: The date of the expense
                 - amount: The amount spent
-                - category: The expense category
+                - currency: The currency symbol or code, '' if none was given
+                - category: The expense category (stored lowercased)
                 - description: A description of the expense
+        now: datetime used for the Timestamp column (defaults to the current time)
+
+        The row is queued and written together with any other expenses added
+        within CONFIG['SHEET_FLUSH_DELAY'] seconds. If CONFIG['SHEET_MAX_PENDING']
+        rows are already waiting, they are written first and any error is raised.
         """
         try:
+            if now is None:
+                now = datetime.datetime.now()
             if isinstance(expense['date'], datetime.datetime):
                 expense['date'] = expense['date'].strftime('%Y-%m-%d')
-            timestamp = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            self.worksheet.append_row([
+            timestamp = now.strftime('%Y-%m-%d %H:%M:%S')
+            row = [
                 expense['date'],
-                # expense['currency'],
                 expense['amount'],
-                expense['category'],
+                expense['category'].lower(),
                 expense['description'],
-                timestamp
-            ])
-            logger.info(f"Added expense: {expense}")
+                timestamp,
+                expense.get('currency', '')
+            ]
+            with self._lock:
+                at_capacity = len(self._pending) >= CONFIG['SHEET_MAX_PENDING']
+            if at_capacity:
+                # Don't keep accepting rows while the sheet can't be written
+                self.flush()
+            with self._lock:
+                self._pending.append(row)
+                self._row_count += 1
+                if self._cache_fresh():
+                    self._cache_row(row)
+                flush_now = len(self._pending) >= CONFIG['SHEET_FLUSH_BATCH_SIZE']
+                if not flush_now:
+                    self._schedule_flush()
+            if flush_now:
+                try:
+                    self.flush()
+                except Exception:
+                    # Already logged; the rows stay queued and a retry is scheduled
+                    pass
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"Added expense: {expense}")
             return True
         except Exception as e:
             logger.error(f"Error adding expense to Google Sheets: {str(e)}")
             raise
     
+    def flush(self):
+        """Write any queued expenses to the Google Sheet."""
+        try:
+            with self._write_lock:
+                self._write_pending()
+        except Exception as e:
+            logger.error(f"Error writing queued expenses to Google Sheets: {str(e)}")
+            raise
+    
+    def _flush_from_timer(self):
+        """Timer callback: write queued rows; a failed write reschedules itself."""
+        try:
+            self.flush()
+        except Exception:
+            # Already logged, and _write_pending scheduled the retry
+            pass
+    
+    def _schedule_flush(self):
+        """Restart the debounce timer for queued rows. Caller holds self._lock."""
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+        delay = min(CONFIG['SHEET_FLUSH_DELAY'] * 2 ** self._flush_failures,
+                    CONFIG['SHEET_FLUSH_MAX_DELAY'])
+        self._flush_timer = threading.Timer(delay, self._flush_from_timer)
+        # Don't hold the process open; the bot flushes on shutdown instead
+        self._flush_timer.daemon = True
+        self._flush_timer.start()
+    
+    def _write_pending(self):
+        """
+        Append all queued rows in one request. Caller holds self._write_lock.
+        The rows stay queued during the request, so add_expense and cached
+        reads carry on meanwhile. On failure a retry is scheduled, whoever
+        the caller is, before the error is raised.
+        """
+        with self._lock:
+            rows = list(self._pending)
+        if rows:
+            try:
+                self.worksheet.append_rows(rows)
+            except Exception:
+                with self._lock:
+                    self._flush_failures += 1
+                    self._schedule_flush()
+                raise
+        with self._lock:
+            if rows:
+                self._flush_failures = 0
+                # Rows queued during the request stay behind the written ones
+                for _ in rows:
+                    self._pending.popleft()
+            if not self._pending and self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+        if rows:
+            logger.info(f"Appended {len(rows)} expense(s) to Google Sheets")
+    
+    def _try_write_pending(self):
+        """Flush before a read; on failure log and read without the queued rows. Caller holds self._write_lock."""
+        try:
+            self._write_pending()
+        except Exception as e:
+            logger.warning(f"Reading Google Sheets with {len(self._pending)} expense(s) still queued: {str(e)}")
+    
+    def _cache_fresh(self):
+        """True if the caches are filled and within their TTL. Caller holds self._lock."""
+        return (self._columns is not None
+                and time.monotonic() - self._cache_loaded_at < CONFIG['SHEET_CACHE_TTL'])
+    
+    def _load_cache(self):
+        """Fetch every row and rebuild the caches unless they are fresh."""
+        with self._lock:
+            if self._cache_fresh():
+                return
+        with self._write_lock:
+            with self._lock:
+                if self._cache_fresh():
+                    return
+            self._try_write_pending()
+            values = self.worksheet.get_all_values(
+                value_render_option='UNFORMATTED_VALUE',
+                date_time_render_option='FORMATTED_STRING')
+            # No write can land until the lock is released, so the queue
+            # holds exactly the rows missing from values
+            with self._lock:
+                self._build_cache(values)
+    
+    def _build_cache(self, values):
+        """Rebuild the caches from get_all_values output. Caller holds self._lock."""
+        header, rows = (values[0], values[1:]) if values else ([], [])
+        self._positions = _column_positions(header)
+        columns = {}
+        for name, i in self._positions.items():
+            columns[name] = [row[i] if i < len(row) else '' for row in rows]
+        columns['Category'] = [str(cat) for cat in columns['Category']]
+        parsed = [_split_amount(amt) for amt in columns['Amount']]
+        amounts = columns['Amount'] = [amt for amt, _ in parsed]
+        columns['Currency'] = [
+            str(cur or prefix).strip().upper()
+            for cur, (_, prefix) in zip(columns['Currency'], parsed)
+        ]
+        # {category: {currency: amount}}; currencies are never added together
+        breakdown = collections.defaultdict(lambda: collections.defaultdict(float))
+        # Categories are lowercased on write, so rows bucket as stored
+        for cat, cur, amt in zip(columns['Category'], columns['Currency'], amounts):
+            breakdown[cat][cur] += amt
+        self._columns = columns
+        self._amounts = amounts
+        self._cache_loaded_at = time.monotonic()
+        self._breakdown_cache = breakdown
+        self._categories_cache = {cat.strip() for cat in columns['Category'] if cat.strip()}
+        # Rows a failed flush left queued aren't in the sheet yet; add them on top
+        for row in self._pending:
+            self._cache_row(row)
+        # Resync with the sheet, which also picks up rows added by hand
+        self._row_count = len(values) + len(self._pending)
+    
+    def _cache_row(self, row):
+        """Add one sheet row to the caches. Caller holds self._lock."""
+        record = dict(zip(CONFIG['SHEET_COLUMNS'], row))
+        amt, prefix = _split_amount(record['Amount'])
+        record['Amount'] = amt
+        record['Currency'] = record['Currency'] or prefix
+        # self._amounts is the Amount column, so this appends it too
+        for name, value in record.items():
+            self._columns[name].append(value)
+        cat = record['Category']
+        self._breakdown_cache[cat][record['Currency']] += amt
+        if cat.strip():
+            self._categories_cache.add(cat.strip())
+    
     def get_recent_expenses(self, count=5):
+        """
+        Return the last count rows of the sheet, newest first. Only the tail
+        is read and nothing is sorted, so this is "most recent" only for rows
+        appended at the end (see the class docstring).
+        """
         try:
-            records = self.worksheet.get_all_records()
-            
-            if records and 'Timestamp' in records[0]:
-                records.sort(key=lambda x: x['Timestamp'], reverse=True)
-            recent = records[:count]
+            if count <= 0:
+                return []
+            with self._lock:
+                if self._cache_fresh():
+                    start = max(0, len(self._amounts) - count)
+                    recent = [
+                        {name: cells[i] for name, cells in self._columns.items()}
+                        for i in range(start, len(self._amounts))
+                    ]
+                else:
+                    recent = None
+            if recent is None:
+                recent = self._fetch_recent(count)
             expenses = []
-            for record in recent:
+            for record in reversed(recent):
+                amount, prefix = _split_amount(record.get('Amount', 0))
                 expenses.append({
                     'date': record.get('Date', ''),
-                    'amount': record.get('Amount', 0),
+                    'amount': amount,
+                    'currency': record.get('Currency', '') or prefix,
                     'category': record.get('Category', ''),
                     'description': record.get('Description', '')
                 })
@@ -94,22 +343,45 @@ class ExpenseSheetManager:
             logger.error(f"Error getting recent expenses: {str(e)}")
             raise
     
+    def _fetch_recent(self, count):
+        """Read the last count records from the sheet plus any still queued."""
+        with self._write_lock:
+            self._try_write_pending()
+            with self._lock:
+                # Rows still queued after a failed flush make up the tail
+                queued = [dict(zip(CONFIG['SHEET_COLUMNS'], row)) for row in self._pending]
+                written = self._row_count - len(queued)
+                positions = self._positions
+            recent = []
+            if written >= 2 and len(queued) < count:
+                start = max(2, written - (count - len(queued)) + 1)
+                end = rowcol_to_a1(written, max(positions.values()) + 1)
+                # Same rendering and column mapping as the cache load
+                rows = self.worksheet.get(
+                    f'A{start}:{end}',
+                    value_render_option='UNFORMATTED_VALUE',
+                    date_time_render_option='FORMATTED_STRING')
+                recent = [_row_to_record(positions, row) for row in rows]
+        return (recent + queued)[-count:]
+    
     def get_total_expenses(self, category=None):
+        """
+        Return (totals, breakdown). Amounts are kept per currency: totals maps
+        currency -> amount, breakdown maps category -> {currency: amount}.
+        Rows without a currency are under ''.
+        """
         try:
-            records = self.worksheet.get_all_records()
+            self._load_cache()
+            with self._lock:
+                breakdown = {cat: dict(amounts) for cat, amounts in self._breakdown_cache.items()}
             if category:
-                filtered_records = [r for r in records if r.get('Category', '').lower() == category.lower()]
+                total = breakdown.get(category.lower(), {})
             else:
-                filtered_records = records
-            total = sum(float(r.get('Amount', 0)) for r in filtered_records)
-            breakdown = {}
-            for record in records:
-                cat = record.get('Category', 'Other')
-                amt = float(record.get('Amount', 0))
-                if cat in breakdown:
-                    breakdown[cat] += amt
-                else:
-                    breakdown[cat] = amt
+                total = collections.defaultdict(float)
+                for amounts in breakdown.values():
+                    for cur, amt in amounts.items():
+                        total[cur] += amt
+                total = dict(total)
             
             return total, breakdown
             
@@ -119,13 +391,10 @@ class ExpenseSheetManager:
     
     def get_categories(self):
         try:
-            records = self.worksheet.get_all_records()
-            categories = set()
-            for record in records:
-                cat = record.get('Category', '').strip()
-                if cat:
-                    categories.add(cat)
-            return sorted(list(categories))
+            self._load_cache()
+            with self._lock:
+                categories = list(self._categories_cache)
+            return sorted(categories)
         except Exception as e:
             logger.error(f"Error getting categories: {str(e)}")
             raise
\ No newline at end of file